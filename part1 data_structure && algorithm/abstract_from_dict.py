@@ -18,3 +18,190 @@ p2 = {key: value for key, value in prices.items() if key in tech_names}
 p1 = dict((key, value) for key, value in prices.items() if value > 200)
 # 但是，字典推导方式表意更清晰，并且实际上也会运行的更快些 
 #（在这个例子中，实际测试几乎比 dict() 函数方式快整整一倍）。
+
+# 字典推导每次都要扫描整个字典。如果字典很大（比如 100 万个元素），
+# 又要反复用同样的条件取子集（比如每次刷新页面），可以额外维护两种索引：
+# 1. 按值排好序的两个平行列表 _values/_keys，用 bisect 找到值的范围，
+#    只比较值，不要求键之间可以比较大小；
+# 2. 按"标签"分组的键集合（比如 tech_names），只记录当前确实在字典里的键。
+# subset() 返回的是一个惰性的只读视图，遍历的时候才根据当前的索引取出匹配的元素，
+# 代价是 O(log n + 匹配的个数)。
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, MutableMapping
+from operator import itemgetter
+
+class IndexedDict(MutableMapping):
+    def __init__(self, *args, **kwargs):
+        self._data = dict(*args, **kwargs)
+        # 初始数据一次性排序
+        items = sorted(self._data.items(), key=itemgetter(1))
+        self._values = list(map(itemgetter(1), items))
+        self._keys = list(map(itemgetter(0), items))
+        # 标签 -> 当前在字典里、属于这个标签的键
+        self._tags = {}
+        # 键 -> 它所属的标签，插入/删除键时用来更新 _tags
+        self._key_tags = {}
+        # 标签 -> 注册时给出的全部键（包括还不在字典里的），重新注册时用来撤销旧的
+        self._tag_keys = {}
+
+    def add_tag_index(self, tag, keys):
+        # keys 要遍历两次，可能是生成器，先转成集合（顺便去掉重复的键）
+        keys = set(keys)
+        # 同一个标签再注册一次就替换掉原来的键，旧的键不再属于这个标签
+        for key in self._tag_keys.pop(tag, ()):
+            tags = self._key_tags[key]
+            tags.discard(tag)
+            if not tags:
+                del self._key_tags[key]
+        for key in keys:
+            self._key_tags.setdefault(key, set()).add(tag)
+        self._tag_keys[tag] = keys
+        self._tags[tag] = {key for key in keys if key in self._data}
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        values, keys = self._values, self._keys
+        if key in self._data:
+            i = self._position(key, self._data[key])
+            j = bisect_right(values, value)
+            if abs(j - i) * 32 < len(values):
+                # 位置变化不大（价格小幅波动的常见情况）：只移动新旧位置之间的元素
+                if j > i:
+                    j -= 1
+                    values[i:j] = values[i + 1:j + 1]
+                    keys[i:j] = keys[i + 1:j + 1]
+                else:
+                    values[j + 1:i + 1] = values[j:i]
+                    keys[j + 1:i + 1] = keys[j:i]
+                values[j] = value
+                keys[j] = key
+                self._data[key] = value
+                return
+            # 位置变化很大：删除再插入，两次 memmove 比大段的切片赋值快
+            del values[i]
+            del keys[i]
+        else:
+            for tag in self._key_tags.get(key, ()):
+                self._tags[tag].add(key)
+        i = bisect_right(values, value)
+        values.insert(i, value)
+        keys.insert(i, key)
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        i = self._position(key, self._data.pop(key))
+        del self._values[i]
+        del self._keys[i]
+        for tag in self._key_tags.get(key, ()):
+            self._tags[tag].discard(key)
+
+    def _position(self, key, value):
+        # 值相同的元素排在一起，从第一个相同的值开始找这个键
+        return self._keys.index(key, bisect_left(self._values, value))
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'IndexedDict({!r})'.format(self._data)
+
+    def subset(self, value_gt=None, value_ge=None, value_lt=None, value_le=None, keys_in=None):
+        """
+        keys_in 可以是 add_tag_index() 注册过的标签（任意可哈希的值），也可以是任意的键集合。
+        注册过的标签优先；没有注册过的字符串会引发 KeyError
+        """
+        return SubsetView(self, value_gt, value_ge, value_lt, value_le, keys_in)
+
+class SubsetView(Mapping):
+    def __init__(self, owner, value_gt, value_ge, value_lt, value_le, keys_in):
+        if value_gt is not None and value_ge is not None or value_lt is not None and value_le is not None:
+            raise ValueError('give at most one lower bound and one upper bound')
+        self._owner = owner
+        self._lo, self._lo_inclusive = (value_ge, True) if value_gt is None else (value_gt, False)
+        self._hi, self._hi_inclusive = (value_le, True) if value_lt is None else (value_lt, False)
+        self._keys_in = keys_in
+
+    def _members(self):
+        keys_in = self._keys_in
+        if keys_in is None:
+            return None
+        try:
+            return self._owner._tags[keys_in]
+        except TypeError:
+            # 不可哈希的（比如 set、list）不可能是标签，就是键的集合本身
+            return keys_in
+        except KeyError:
+            # 字符串不当作键的集合，否则 'e' in 'tech' 这样的子串匹配会混进来
+            if isinstance(keys_in, (str, bytes)):
+                raise KeyError('unknown tag: {!r}'.format(keys_in)) from None
+            return keys_in
+
+    def _bounds(self):
+        values = self._owner._values
+        if self._lo is None:
+            i = 0
+        else:
+            i = (bisect_left if self._lo_inclusive else bisect_right)(values, self._lo)
+        if self._hi is None:
+            j = len(values)
+        else:
+            j = (bisect_right if self._hi_inclusive else bisect_left)(values, self._hi)
+        return i, max(i, j)
+
+    def _in_range(self, value):
+        lo, hi = self._lo, self._hi
+        if lo is not None and not (value >= lo if self._lo_inclusive else value > lo):
+            return False
+        if hi is not None and not (value <= hi if self._hi_inclusive else value < hi):
+            return False
+        return True
+
+    def __contains__(self, key):
+        data = self._owner._data
+        if key not in data:
+            return False
+        members = self._members()
+        if members is not None and key not in members:
+            return False
+        return self._in_range(data[key])
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self._owner._data[key]
+
+    def __iter__(self):
+        i, j = self._bounds()
+        members = self._members()
+        if members is None:
+            return iter(self._owner._keys[i:j])
+        if len(members) < j - i:
+            # 标签里的键比值范围内的元素少，就遍历标签
+            return (key for key in list(members) if key in self)
+        return (key for key in self._owner._keys[i:j] if key in members)
+
+    def __len__(self):
+        if self._keys_in is None:
+            i, j = self._bounds()
+            return j - i
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return 'SubsetView({!r})'.format(dict(self))
+
+index = IndexedDict(prices)
+index.add_tag_index('tech', tech_names)
+dict(index.subset(value_gt=200))
+# {'IBM': 205.55, 'AAPL': 612.78}
+dict(index.subset(keys_in='tech'))
+# {'HPQ': 37.2, 'IBM': 205.55, 'AAPL': 612.78}
+# 视图是惰性的，字典修改之后再遍历就能看到新的结果
+tech_over_200 = index.subset(value_gt=200, keys_in='tech')
+index['MSFT'] = 300.0
+dict(tech_over_200)
+# {'IBM': 205.55, 'MSFT': 300.0, 'AAPL': 612.78}
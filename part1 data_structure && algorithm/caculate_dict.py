@@ -55,4 +55,137 @@ for i in zip(prices.values(), prices.keys()):
 min(zip(prices.values(), prices.keys()))
 # 45.23, 'AAA')
 max(zip(prices.values(), prices.keys()))
-# (45.23, 'ZZZ')
\ No newline at end of file
+# (45.23, 'ZZZ')
+"""
+上面的做法每次查询都要把整个字典 zip 一遍，字典很大并且不停更新的时候，
+（比如 20 万只股票，每秒几千次更新，每批更新后都要查一次最高价和最低价）就太慢了。
+下面的 PriceBook 是一个普通的可变映射，同时额外维护一个按 (值, 键) 排好序的索引。
+索引是分块的有序列表：每块最多 2 * _LOAD 个元素，另外用 _maxes 记录每块的最大元素。
+这样插入和删除只需要二分找到所在的块，再在块内 insort/del，比在一个大列表里移动元素快得多。
+min()/max() 是 O(1)，rank()/range() 是 O(log n)（加上块的个数）。
+"""
+from bisect import bisect_left, insort
+from collections.abc import MutableMapping
+from itertools import accumulate
+
+class PriceBook(MutableMapping):
+    _LOAD = 1000
+
+    def __init__(self, *args, **kwargs):
+        # 初始数据一次性排好序再切成块，比逐个插入快
+        self._prices = dict(*args, **kwargs)
+        pairs = sorted(zip(self._prices.values(), self._prices.keys()))
+        self._lists = [pairs[i:i + self._LOAD] for i in range(0, len(pairs), self._LOAD)]
+        self._maxes = [chunk[-1] for chunk in self._lists]
+        # 每块之前一共有多少个元素，修改之后在 rank() 时重新计算
+        self._offsets = None
+
+    def __getitem__(self, key):
+        return self._prices[key]
+
+    def __setitem__(self, key, value):
+        if key in self._prices:
+            self._remove((self._prices[key], key))
+        self._prices[key] = value
+        self._insert((value, key))
+
+    def __delitem__(self, key):
+        self._remove((self._prices.pop(key), key))
+
+    def __iter__(self):
+        return iter(self._prices)
+
+    def __len__(self):
+        return len(self._prices)
+
+    def __repr__(self):
+        return 'PriceBook({!r})'.format(self._prices)
+
+    def _insert(self, pair):
+        lists, maxes = self._lists, self._maxes
+        self._offsets = None
+        if not lists:
+            lists.append([pair])
+            maxes.append(pair)
+            return
+        i = bisect_left(maxes, pair)
+        if i == len(maxes):
+            i -= 1
+            lists[i].append(pair)
+            maxes[i] = pair
+        else:
+            insort(lists[i], pair)
+        if len(lists[i]) > 2 * self._LOAD:
+            # 块太大了就一分为二
+            half = lists[i][self._LOAD:]
+            del lists[i][self._LOAD:]
+            maxes[i] = lists[i][-1]
+            lists.insert(i + 1, half)
+            maxes.insert(i + 1, half[-1])
+
+    def _remove(self, pair):
+        lists, maxes = self._lists, self._maxes
+        self._offsets = None
+        i = bisect_left(maxes, pair)
+        chunk = lists[i]
+        del chunk[bisect_left(chunk, pair)]
+        if chunk:
+            maxes[i] = chunk[-1]
+        else:
+            del lists[i]
+            del maxes[i]
+
+    def min(self):
+        # 返回 (值, 键)，和 min(zip(prices.values(), prices.keys())) 一样
+        if not self._lists:
+            raise ValueError('min() of an empty PriceBook')
+        return self._lists[0][0]
+
+    def max(self):
+        if not self._maxes:
+            raise ValueError('max() of an empty PriceBook')
+        return self._maxes[-1]
+
+    def rank(self, key):
+        """
+        key 在按 (值, 键) 排序后的位置，最小的是 0
+        """
+        pair = (self._prices[key], key)
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(map(len, self._lists))]
+        i = bisect_left(self._maxes, pair)
+        return self._offsets[i] + bisect_left(self._lists[i], pair)
+
+    def range(self, lo=None, hi=None):
+        """
+        按顺序返回 lo <= 值 <= hi 的所有 (值, 键)，lo/hi 为 None 表示不限制
+        """
+        lists = self._lists
+        if lo is None:
+            i = j = 0
+        else:
+            # (lo,) 比任何 (lo, key) 都小
+            i = bisect_left(self._maxes, (lo,))
+            j = bisect_left(lists[i], (lo,)) if i < len(lists) else 0
+        for chunk in lists[i:]:
+            for pair in chunk[j:]:
+                if hi is not None and pair[0] > hi:
+                    return
+                yield pair
+            j = 0
+
+    def sorted_items(self):
+        return self.range()
+
+book = PriceBook(prices)
+book.min()
+# (10.75, 'FB')
+book.max()
+# (612.78, 'AAPL')
+book['FB'] = 700.0
+book.max()
+# (700.0, 'FB')
+book.rank('IBM')
+# 2
+list(book.range(40, 300))
+# [(45.23, 'ACME'), (205.55, 'IBM')]
@@ -49,4 +49,267 @@ b = set(a)
 # 比如，如果如果你想读取一个文件，消除重复行，你可以很容易像这样做：
 with open(somefile,'r') as f:
     for line in dedupe(f):
-        print(line)
\ No newline at end of file
+        print(line)
+
+# 上面的 dedupe() 要把见过的每一个键都放在集合里。
+# 如果文件有几亿行，这个集合本身就会把内存用光。这时候有两种思路：
+
+# 1. 近似去重：用布隆过滤器（Bloom filter）代替集合。
+# 它用一个固定大小的位数组记录见过的键，内存只和预计的元素个数、允许的误判率有关，
+# 和键本身有多大无关。代价是有一定概率把一个没见过的键误判为"见过"（会被误删），
+# 但绝不会把重复的元素放过去。
+import math
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        # 位数组长度 m 和哈希函数个数 k 用标准公式计算，
+        # 比如 capacity=4亿、error_rate=0.01 时大约需要 457MB。
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # 把 hash() 的结果用 splitmix64 打散，再用双重哈希生成 k 个位置。
+        # 所以 hash() 相同的不同键一定会互相误判（比如 CPython 里 hash(-1) == hash(-2)），
+        # 对字符串这种 64 位哈希的键来说几乎不会发生。
+        z = (hash(value) + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        z ^= z >> 31
+        h1, h2 = z & 0xFFFFFFFF, (z >> 32) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, value):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    def add(self, value):
+        # 加入一个元素，返回它之前是否（可能）已经存在，这样去重的时候只需要算一次哈希。
+        bits = self._bits
+        present = True
+        for pos in self._positions(value):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                present = False
+                bits[pos >> 3] |= mask
+        return present
+
+def bloom_dedupe(items, key=None, capacity=10000000, error_rate=0.001):
+    seen = BloomFilter(capacity, error_rate)
+    for item in items:
+        val = item if key is None else key(item)
+        if not seen.add(val):
+            yield item
+
+# 2. 精确去重：内存里最多只放 max_keys 个键。超过以后，把剩下的元素连同它们的序号
+# 按键的哈希值分到若干个临时文件里（相同的键一定在同一个文件），再逐个文件去重，
+# 最后用 heapq.merge() 按序号把各个文件的结果合并起来，这样仍然保持第一次出现的顺序。
+# 一个分区如果还是放不下，就用不同的哈希再分一次。
+import heapq
+import pickle
+import tempfile
+from operator import itemgetter
+
+def spill_dedupe(items, key=None, max_keys=1000000, partitions=64, tmpdir=None):
+    records = ((index, item if key is None else key(item), item)
+               for index, item in enumerate(items))
+    for index, _, item in _dedupe_records(records, max_keys, partitions, tmpdir, 0):
+        if index >= 0:
+            yield item
+
+def _dedupe_records(records, max_keys, partitions, tmpdir, level):
+    # records 是按序号递增的 (序号, 键, 元素)，序号为 -1 的是"已经输出过"的标记。
+    seen = set()
+    records = iter(records)
+    for record in records:
+        if record[1] not in seen:
+            # 相同哈希值的不同键分不开，分了很多层还放不下就只好超出预算了。
+            if len(seen) >= max_keys and level < 8:
+                break
+            seen.add(record[1])
+            yield record
+    else:
+        return
+
+    files = [tempfile.TemporaryFile(dir=tmpdir) for _ in range(partitions)]
+    outputs = []
+    try:
+        buffers = [[] for _ in range(partitions)]
+        def write(record):
+            i = hash((level, record[1])) % partitions
+            buffers[i].append(record)
+            if len(buffers[i]) >= 1000:
+                pickle.dump(buffers[i], files[i], pickle.HIGHEST_PROTOCOL)
+                buffers[i].clear()
+        for val in seen:
+            write((-1, val, None))
+        seen = None
+        write(record)
+        for record in records:
+            write(record)
+        for buf, f in zip(buffers, files):
+            pickle.dump(buf, f, pickle.HIGHEST_PROTOCOL)
+
+        for f in files:
+            f.seek(0)
+            out = tempfile.TemporaryFile(dir=tmpdir)
+            outputs.append(out)
+            _dump_batched((r for r in _dedupe_records(_load_batched(f), max_keys, partitions,
+                                                      tmpdir, level + 1) if r[0] >= 0), out)
+            f.close()
+            out.seek(0)
+        yield from heapq.merge(*map(_load_batched, outputs), key=itemgetter(0))
+    finally:
+        for f in files + outputs:
+            f.close()
+
+def _dump_batched(records, f, size=1000):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+            batch.clear()
+    pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+
+def _load_batched(f):
+    while True:
+        try:
+            batch = pickle.load(f)
+        except EOFError:
+            return
+        yield from batch
+
+a = [ {'x':1, 'y':2}, {'x':1, 'y':3}, {'x':1, 'y':2}, {'x':2, 'y':4}]
+list(spill_dedupe(a, key=lambda d: (d['x'],d['y']), max_keys=1, partitions=2))
+# [{'x': 1, 'y': 2}, {'x': 1, 'y': 3}, {'x': 2, 'y': 4}]
+list(bloom_dedupe(a, key=lambda d: (d['x'],d['y']), capacity=100))
+# [{'x': 1, 'y': 2}, {'x': 1, 'y': 3}, {'x': 2, 'y': 4}]
+
+# 读取大文件的时候用法和 dedupe() 一样：
+# with open(somefile,'r') as f:
+#     for line in spill_dedupe(f, max_keys=10000000):
+#         print(line)
+
+
+# 如果去重的瓶颈在 CPU 上（比如 key 函数比较复杂），可以利用多个进程。
+# 思路和 map-reduce 一样：
+# map：把数据切成若干块，每个进程计算一块的键，并按键的哈希值分到 N 个分片里。
+# reduce：每个分片独立去重（相同的键一定在同一个分片），返回第一次出现的序号。
+# 最后用 heapq.merge() 把各个分片的序号按顺序合并，就得到了和 dedupe() 一样的结果。
+# 主进程按块读取数据，每一块作为任务参数只发给处理它的那个进程，
+# 不会把全部数据先读进主进程的内存，也不会给每个子进程各复制一份。
+# 分片的中间结果和每块里需要保留的元素都写在临时目录里，最后按顺序读回来输出。
+# 注意 key 函数要能被 pickle，所以 key 不能是 lambda，可以用 itemgetter。
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice, repeat
+
+def parallel_dedupe(items, key=None, workers=None, chunksize=100000, mp_context=None):
+    workers = workers or os.cpu_count()
+    # 没有指定 mp_context 时自己按当前的默认方式创建一个（get_all_start_methods() 的第一个
+    # 就是平台默认的方式），不调用不带参数的 get_start_method()/get_context()，
+    # 因为它们会顺带把全局的启动方式固定下来
+    if mp_context is None:
+        method = (multiprocessing.get_start_method(allow_none=True)
+                  or multiprocessing.get_all_start_methods()[0])
+        mp_context = multiprocessing.get_context(method)
+    # 只有 fork 出来的子进程才和主进程用同一个字符串哈希种子，其它启动方式
+    # （spawn，以及 Python 3.14 起 Linux 上默认的 forkserver）都要用 _stable_hash()
+    shard_hash = hash if mp_context.get_start_method() == 'fork' else _stable_hash
+    items = iter(items)
+    starts = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with ProcessPoolExecutor(workers, mp_context=mp_context, initializer=_init_worker,
+                                 initargs=(key, shard_hash, workers, tmpdir)) as pool:
+            pending = set()
+            start = 0
+            while True:
+                chunk = list(islice(items, chunksize))
+                if not chunk:
+                    break
+                if len(pending) >= 2 * workers:
+                    # 正在排队的块不超过 2 * workers 个，主进程的内存不随数据量增长
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(pool.submit(_shard_chunk, start, chunk))
+                starts.append(start)
+                start += len(chunk)
+                del chunk
+            for future in pending:
+                future.result()
+            kept = list(pool.map(_dedupe_shard, range(workers), repeat(starts)))
+        indices = heapq.merge(*kept)
+        index = next(indices, None)
+        for start in starts:
+            with open(_items_path(tmpdir, start), 'rb') as f:
+                firsts = pickle.load(f)
+            # 各块里保留的元素都是块内第一次出现的，和 indices 一样按序号排好了
+            for i, item in firsts:
+                if i == index:
+                    yield item
+                    index = next(indices, None)
+
+_worker = {}
+
+def _init_worker(key, shard_hash, nshards, tmpdir):
+    _worker.update(key=key, shard_hash=shard_hash, nshards=nshards, tmpdir=tmpdir)
+
+def _shard_chunk(start, chunk):
+    key, shard_hash, nshards = _worker['key'], _worker['shard_hash'], _worker['nshards']
+    tmpdir = _worker['tmpdir']
+    parts = [[] for _ in range(nshards)]
+    firsts = []
+    # 块内先去一次重，减少写到磁盘上的数据
+    seen = set()
+    for index, item in enumerate(chunk, start):
+        val = item if key is None else key(item)
+        if val not in seen:
+            seen.add(val)
+            parts[shard_hash(val) % nshards].append((index, val))
+            firsts.append((index, item))
+    for shard, part in enumerate(parts):
+        with open(_part_path(tmpdir, shard, start), 'wb') as f:
+            pickle.dump(part, f, pickle.HIGHEST_PROTOCOL)
+    with open(_items_path(tmpdir, start), 'wb') as f:
+        pickle.dump(firsts, f, pickle.HIGHEST_PROTOCOL)
+
+def _dedupe_shard(shard, starts):
+    seen = set()
+    kept = []
+    for start in starts:
+        with open(_part_path(_worker['tmpdir'], shard, start), 'rb') as f:
+            part = pickle.load(f)
+        for index, val in part:
+            if val not in seen:
+                seen.add(val)
+                kept.append(index)
+    return kept
+
+def _part_path(tmpdir, shard, start):
+    return os.path.join(tmpdir, '{}-{}.pickle'.format(shard, start))
+
+def _items_path(tmpdir, start):
+    return os.path.join(tmpdir, 'items-{}.pickle'.format(start))
+
+def _stable_hash(val):
+    # 字符串的 hash() 在每个进程里都不一样（哈希随机化），
+    # 分片时必须保证不同的进程把同一个键分到同一个分片。
+    if isinstance(val, str):
+        return zlib.crc32(val.encode('utf-8', 'surrogatepass'))
+    if isinstance(val, bytes):
+        return zlib.crc32(val)
+    if isinstance(val, tuple):
+        h = 0x345678
+        for v in val:
+            h = ((h * 1000003) ^ _stable_hash(v)) & 0xFFFFFFFFFFFFFFFF
+        return h
+    return hash(val)
+
+if __name__ == '__main__':
+    a = [ {'x':1, 'y':2}, {'x':1, 'y':3}, {'x':1, 'y':2}, {'x':2, 'y':4}]
+    print(list(parallel_dedupe(a, key=itemgetter('x', 'y'), workers=2)))
+    # [{'x': 1, 'y': 2}, {'x': 1, 'y': 3}, {'x': 2, 'y': 4}]
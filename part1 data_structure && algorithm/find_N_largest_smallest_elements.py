@@ -28,6 +28,8 @@ expensive = heapq.nlargest(3, portfolio, key=lambda s: s['price'])
 （这种操作时间复杂度仅仅是 O(log N)，N 是堆大小）。 
 比如，如果想要查找最小的 3 个元素，你可以这样做：
 """
+heap = list(nums)
+heapq.heapify(heap)
 print(heapq.heappop(heap))
 -4
 print(heapq.heappop(heap))
@@ -45,4 +47,197 @@ print(heapq.heappop(heap))
 （ sorted(items)[:N] 或者是 sorted(items)[-N:] ）。 
 需要在正确场合使用函数 nlargest() 和 nsmallest() 才能发挥它们的优势 
 （如果 N 快接近集合大小了，那么使用排序操作会更好些）。
-"""
\ No newline at end of file
+"""
+
+"""
+nlargest() 和 nsmallest() 需要把所有数据都放在一个可迭代对象里一次处理完。
+如果数据是一个无限长（或者大到没法放进内存）的流，
+比如要从两千个每日交易文件里找出金额最大的 100 笔交易，
+可以维护一个大小固定为 k 的堆：堆顶是目前 k 个元素里"最差"的那个，
+新元素只有比它更好的时候才替换进去，内存始终是 O(k)。
+"""
+from itertools import islice
+
+class _Reverse:
+    # 求最小的 k 个时用来反转比较顺序，这样同样可以用 heapq 的最小堆。
+    __slots__ = ('value',)
+    def __init__(self, value):
+        self.value = value
+    def __lt__(self, other):
+        return other.value < self.value
+    def __eq__(self, other):
+        return self.value == other.value
+
+class TopK:
+    def __init__(self, k, key=None, largest=True):
+        self.k = k
+        self.key = key
+        self.largest = largest
+        # 堆里放 (比较值, -序号, item)，相同的值先出现的元素排在前面，和 nlargest() 一致。
+        self._heap = []
+        self._index = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, item):
+        self._push(item if self.key is None else self.key(item), item)
+
+    def update(self, items):
+        # 每次从流里取一块数据，先用 C 实现的 nlargest()/nsmallest() 选出这一块的前 k 个，
+        # 再逐个放进堆里。相同值的元素在块内保持原来的先后顺序，所以结果和逐个 push 一样。
+        key = self.key
+        select = heapq.nlargest if self.largest else heapq.nsmallest
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, max(self.k * 8, 4096)))
+            if not chunk:
+                break
+            for item in select(self.k, chunk, key=key):
+                self._push(item if key is None else key(item), item)
+
+    def _push(self, value, item):
+        heap = self._heap
+        self._index += 1
+        if len(heap) < self.k:
+            heapq.heappush(heap, (value if self.largest else _Reverse(value), -self._index, item))
+            return
+        if not heap:
+            return
+        # 堆已经满了：先和堆顶比较，比它差的元素直接丢掉，不需要创建元组。
+        worst = heap[0][0]
+        if self.largest:
+            if worst < value:
+                heapq.heapreplace(heap, (value, -self._index, item))
+        elif value < worst.value:
+            heapq.heapreplace(heap, (_Reverse(value), -self._index, item))
+
+    def merge(self, other):
+        """
+        把另一个 TopK 的结果合并进来（原地修改），用于汇总各个文件或者各个进程的部分结果。
+        """
+        if self.largest != other.largest:
+            raise ValueError('cannot merge largest and smallest TopK')
+        for value, _, item in sorted(other._heap, reverse=True):
+            self._push(value if self.largest else value.value, item)
+        return self
+
+    def __add__(self, other):
+        result = TopK(self.k, self.key, self.largest)
+        return result.merge(self).merge(other)
+
+    def result(self):
+        # 和 nlargest()/nsmallest() 一样，返回排好序的列表。
+        return [item for _, _, item in sorted(self._heap, reverse=True)]
+
+top = TopK(3, key=lambda s: s['price'])
+top.update(portfolio)
+top.result() == expensive
+# True
+
+# 多个 TopK 可以合并。比如每个文件各统计一个（也可以放到不同的进程里去做，
+# 这时 key 要用 itemgetter 这样能被 pickle 的对象），最后再汇总：
+from operator import itemgetter
+
+part1 = TopK(3, key=itemgetter('price'), largest=False)
+part1.update(portfolio[:3])
+part2 = TopK(3, key=itemgetter('price'), largest=False)
+part2.update(portfolio[3:])
+(part1 + part2).result() == cheap
+# True
+
+"""
+前面提到的经验法则（N=1 用 min()/max()，N 很小用堆，N 接近集合大小就排序后切片）
+可以写成一个函数自动选择。实际测一下，在普通的列表上 N 超过集合大小的 5% 左右
+排序就已经比 nlargest() 快了（见下面的 benchmark()）。
+如果数据本身就是 NumPy 的数值数组，或者 key 是一列预先算好的数值（和 items 一一对应的
+NumPy 数组），就用 np.argpartition() 做 O(n) 的选择，只对选出的 N 个排序。
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def select_top(items, n, key=None, largest=True):
+    if np is not None:
+        if isinstance(key, np.ndarray):
+            values = key
+        elif key is None and isinstance(items, np.ndarray):
+            values = items
+        else:
+            values = None
+        if values is not None and values.dtype.kind in 'iuf':
+            idx = _argtop(values, n, largest)
+            if isinstance(items, np.ndarray):
+                return items[idx]
+            return [items[i] for i in idx]
+    if not hasattr(items, '__len__'):
+        items = list(items)
+    if n <= 0:
+        return []
+    if n == 1 and len(items):
+        return [(max if largest else min)(items, key=key)]
+    if n * 20 >= len(items):
+        return sorted(items, key=key, reverse=largest)[:n]
+    return (heapq.nlargest if largest else heapq.nsmallest)(n, items, key=key)
+
+def _argtop(values, n, largest):
+    # 返回最大（或最小）的 n 个元素的下标，按从好到差排列。
+    # 相同的值按原来的先后顺序排列，和 nlargest()/nsmallest() 的结果一致。
+    size = len(values)
+    n = max(0, min(n, size))
+    if n == 0:
+        return np.arange(0)
+    if largest:
+        # 整数不能取负：INT64_MIN 取负会溢出，uint64 转成 int64 也会溢出。
+        # 按位取反 ~x 对有符号和无符号整数都正好把大小顺序倒过来，而且不会溢出
+        values = -values if values.dtype.kind == 'f' else ~values
+    if n < size:
+        # argpartition() 只保证第 n 个位置上的值是对的，
+        # 比它好的全部保留，和它相等的按下标顺序补足 n 个。
+        kth = values[np.argpartition(values, n - 1)[n - 1]]
+        better = np.flatnonzero(values < kth)
+        ties = np.flatnonzero(values == kth)[:n - len(better)]
+        idx = np.sort(np.concatenate((better, ties)))
+    else:
+        idx = np.arange(size)
+    return idx[np.argsort(values[idx], kind='stable')]
+
+select_top(nums, 3)
+# [42, 37, 23]
+select_top(portfolio, 2, key=lambda s: s['price'], largest=False)
+# [{'name': 'YHOO', 'shares': 45, 'price': 16.35}, {'name': 'FB', 'shares': 200, 'price': 21.09}]
+
+def benchmark():
+    """
+    比较不同大小、不同 N 时各种方法的耗时
+    """
+    import random
+    import time
+
+    def timeit(func, *args):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+    for size in (1000, 100000, 1000000):
+        data = [random.random() for _ in range(size)]
+        array = np.array(data) if np is not None else None
+        for n in sorted({1, 10, size // 100, size // 20, size // 5, size // 2}):
+            row = [
+                ('max', timeit(max, data) if n == 1 else None),
+                ('nlargest', timeit(heapq.nlargest, n, data)),
+                ('sorted', timeit(lambda: sorted(data, reverse=True)[:n])),
+                ('argpartition', timeit(select_top, array, n) if array is not None else None),
+            ]
+            print('size={:<8} n={:<7}'.format(size, n),
+                  '  '.join('{}={:.4f}s'.format(name, t) for name, t in row if t is not None))
+
+if __name__ == '__main__':
+    benchmark()
+    # 部分结果（1,000,000 个随机浮点数）：
+    # size=1000000  n=10      nlargest=0.0260s  sorted=0.4653s  argpartition=0.0137s
+    # size=1000000  n=10000   nlargest=0.1527s  sorted=0.5094s  argpartition=0.0127s
+    # size=1000000  n=50000   nlargest=0.4670s  sorted=0.3858s  argpartition=0.0229s
+    # size=1000000  n=200000  nlargest=2.0153s  sorted=0.4919s  argpartition=0.0601s
+    # N 小的时候 nlargest() 最快，N 超过 5% 左右以后排序更快；NumPy 数组则一直是 argpartition 最快。
@@ -27,4 +27,152 @@ a.items() & b.items() # { ('y', 2) }
 # 下面利用字典推导来实现这样的需求：
 # Make a new dictionary with certain keys removed
 c = {key:a[key] for key in a.keys() - {'z', 'w'}}
-# c is {'x': 1, 'y': 2}
\ No newline at end of file
+# c is {'x': 1, 'y': 2}
+# 上面的集合操作会创建临时的集合。两个字典都有几千万个元素的时候，
+# 这些临时集合本身就要占用好几个 G 的内存，而且要求两个字典都完整地放在内存里。
+# dict_diff() 返回三个惰性的迭代器：新增的键、删除的键、值改变了的键，
+# 逐个检查，不创建任何临时集合。
+from collections import namedtuple
+
+DictDiff = namedtuple('DictDiff', ['added', 'removed', 'changed'])
+
+def dict_diff(a, b):
+    if isinstance(a, Snapshot) and isinstance(b, Snapshot):
+        return _snapshot_diff(a, b)
+    return DictDiff((key for key in b if key not in a),
+                    (key for key in a if key not in b),
+                    (key for key in a if key in b and a[key] != b[key]))
+
+# 保存在磁盘上的快照可以做得更好：写快照的时候按键的哈希值把元素分到若干个桶里，
+# 每个桶一个文件，同时把每个桶内容的摘要记在 manifest.json 里。
+# 比较两个快照时先比较摘要，只有摘要不同的桶才需要读进内存逐个比较。
+# 桶的摘要是每个 (键, 值) 各自的 blake2b 值加起来对 2**128 取模，和写入的先后顺序无关，
+# 所以同样的内容按不同的顺序写出来（比如从查询结果重建），摘要也一样。
+import hashlib
+import json
+import os
+import pickle
+import zlib
+from itertools import tee
+
+def _canonical(key):
+    # 相等的键必须分到同一个桶里，但 1、1.0、True 相等，pickle 出来却不一样，
+    # 所以先把值为整数的数字统一成 int，元组里的元素也一样处理。
+    # 其它相等但 pickle 结果不同的键（比如 Decimal(1) 和 1）需要调用方自己先统一
+    if isinstance(key, tuple):
+        return tuple(_canonical(k) for k in key)
+    if isinstance(key, bool) or (isinstance(key, float) and key.is_integer()):
+        return int(key)
+    return key
+
+def _bucket_of(key, buckets):
+    # 不能用 hash()：字符串的 hash() 每次启动 Python 都不一样
+    return zlib.crc32(pickle.dumps(_canonical(key), 4)) % buckets
+
+def write_snapshot(items, directory, buckets=1024, batch_size=100000):
+    """
+    把一个字典（或者 (键, 值) 的可迭代对象）写成快照，内存里最多缓存 batch_size 个元素
+    """
+    if isinstance(items, dict):
+        items = items.items()
+    os.makedirs(directory, exist_ok=True)
+    digests = [0] * buckets
+    paths = [os.path.join(directory, 'bucket-{:05d}.pickle'.format(i)) for i in range(buckets)]
+    # 桶的数量可能比允许打开的文件数还多，所以不能同时打开所有桶：
+    # 这里先逐个清空（目录里可能有上一次的快照），之后每次写一批再以追加方式打开
+    for path in paths:
+        open(path, 'wb').close()
+    pending = [[] for _ in range(buckets)]
+    # 每个桶攒够一批就单独写出去
+    limit = max(1, batch_size // buckets)
+    for key, value in items:
+        i = _bucket_of(key, buckets)
+        batch = pending[i]
+        batch.append((key, value))
+        if len(batch) >= limit:
+            digests[i] += _flush_bucket(batch, paths[i])
+    for i, batch in enumerate(pending):
+        digests[i] += _flush_bucket(batch, paths[i])
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump({'buckets': buckets,
+                   'digests': ['{:032x}'.format(d % 2 ** 128) for d in digests]}, f)
+    return Snapshot(directory)
+
+def _flush_bucket(batch, path):
+    # 返回这一批元素摘要的和
+    if not batch:
+        return 0
+    with open(path, 'ab') as f:
+        pickle.dump(batch, f, pickle.HIGHEST_PROTOCOL)
+    total = sum(int.from_bytes(hashlib.blake2b(pickle.dumps((_canonical(key), value), 4),
+                                               digest_size=16).digest(), 'little')
+                for key, value in batch)
+    batch.clear()
+    return total
+
+class Snapshot:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        self.buckets = manifest['buckets']
+        self.digests = manifest['digests']
+
+    def bucket(self, i):
+        """
+        把第 i 个桶读成一个字典
+        """
+        result = {}
+        with open(os.path.join(self.directory, 'bucket-{:05d}.pickle'.format(i)), 'rb') as f:
+            while True:
+                try:
+                    result.update(pickle.load(f))
+                except EOFError:
+                    return result
+
+    def __repr__(self):
+        return 'Snapshot({!r})'.format(self.directory)
+
+def _snapshot_diff(a, b):
+    if a.buckets != b.buckets:
+        raise ValueError('snapshots must use the same number of buckets')
+    differ = [i for i, (x, y) in enumerate(zip(a.digests, b.digests)) if x != y]
+
+    def buckets():
+        # 每对桶只读一次，一次算出三种结果
+        for i in differ:
+            old, new = a.bucket(i), b.bucket(i)
+            yield tuple(map(list, dict_diff(old, new)))
+
+    # tee() 只缓存还没被全部三个迭代器取走的那几个桶的比较结果，不缓存桶本身
+    per_bucket = tee(buckets(), 3)
+
+    def diff(index):
+        for results in per_bucket[index]:
+            yield from results[index]
+
+    return DictDiff(diff(0), diff(1), diff(2))
+
+added, removed, changed = dict_diff(a, b)
+list(added)
+# ['w']
+list(removed)
+# ['z']
+list(changed)
+# ['x']
+
+if __name__ == '__main__':
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old = {'key{}'.format(i): i for i in range(1000000)}
+        new = dict(old)
+        new['key5'] = -5
+        del new['key7']
+        new['extra'] = 0
+        s1 = write_snapshot(old, os.path.join(tmpdir, 'old'))
+        s2 = write_snapshot(new, os.path.join(tmpdir, 'new'))
+        print(sum(x != y for x, y in zip(s1.digests, s2.digests)))
+        # 3
+        added, removed, changed = dict_diff(s1, s2)
+        print(list(added), list(removed), list(changed))
+        # ['extra'] ['key7'] ['key5']
@@ -39,4 +39,162 @@ for row in rows:
     rows_by_date[row['date']].append(row)
 
 for r in rows_by_date['07/01/2012']:
-    print(r)
\ No newline at end of file
+    print(r)
+
+# 先 sort() 再 groupby() 的前提是所有的行都能放进内存。
+# 如果数据比内存大很多，可以用外部排序：每次读入 memory_limit 行，
+# 排好序以后写到一个临时文件里（一个"顺串"），最后用 heapq.merge() 把所有顺串
+# 归并成一个有序的流，再交给 groupby()。内存里同时只有每个顺串的一小段。
+# 用法和 itertools.groupby() 一样，同样要按顺序消费每一组。
+import heapq
+import pickle
+import tempfile
+from itertools import islice
+
+def external_groupby(rows, key, memory_limit=1000000, tmpdir=None):
+    rows = iter(rows)
+    runs = []
+    try:
+        while True:
+            chunk = list(islice(rows, memory_limit))
+            if not chunk:
+                break
+            # sort() 是稳定的，heapq.merge() 对相同的键也按顺串的先后输出，
+            # 所以每一组里的行保持原来的顺序。
+            chunk.sort(key=key)
+            if not runs and len(chunk) < memory_limit:
+                # 数据本来就放得下内存，不需要写文件
+                yield from groupby(chunk, key)
+                return
+            f = tempfile.TemporaryFile(dir=tmpdir)
+            for start in range(0, len(chunk), 1000):
+                pickle.dump(chunk[start:start + 1000], f, pickle.HIGHEST_PROTOCOL)
+            f.seek(0)
+            runs.append(f)
+            del chunk
+        yield from groupby(heapq.merge(*map(_read_run, runs), key=key), key)
+    finally:
+        for f in runs:
+            f.close()
+
+def _read_run(f):
+    while True:
+        try:
+            batch = pickle.load(f)
+        except EOFError:
+            return
+        yield from batch
+
+for date, items in external_groupby(rows, key=itemgetter('date'), memory_limit=3):
+    print(date)
+    for i in items:
+        print(' ', i)
+# 07/01/2012
+#   {'address': '5412 N CLARK', 'date': '07/01/2012'}
+#   {'address': '4801 N BROADWAY', 'date': '07/01/2012'}
+# 07/02/2012
+#   {'address': '5800 E 58TH', 'date': '07/02/2012'}
+#   {'address': '5645 N RAVENSWOOD', 'date': '07/02/2012'}
+#   {'address': '1060 W ADDISON', 'date': '07/02/2012'}
+# 07/03/2012
+#   {'address': '2122 N CLARK', 'date': '07/03/2012'}
+# 07/04/2012
+#   {'address': '5148 N CLARK', 'date': '07/04/2012'}
+#   {'address': '1039 W GRANVILLE', 'date': '07/04/2012'}
+
+
+# 很多时候分组只是为了做汇总（计数、求和、最大最小值、平均值）。
+# 用 defaultdict(list) 先把每一行都存起来再计算，内存和行数成正比。
+# 其实每一组只需要保存几个累加值，一次遍历就能算完，内存只和组的个数有关。
+# 各个部分的累加值还可以合并，所以也可以把数据分块交给多个进程，最后再汇总。
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+def aggregate(rows, by, count=False, sum=None, min=None, max=None, mean=None,
+              workers=None, chunksize=100000):
+    """
+    by 是分组用的字段名（多个字段用元组）；sum/min/max/mean 是要汇总的字段名（或字段名的元组）。
+    返回 {分组的值: {'count': 行数, 'sum_shares': ..., 'mean_price': ..., ...}}。
+    指定 workers 时把数据按 chunksize 分块，在多个进程里分别汇总后再合并。
+    """
+    ops = []
+    for op, fields in (('sum', sum), ('min', min), ('max', max), ('mean', mean)):
+        if fields is not None:
+            ops.extend((op, field) for field in ((fields,) if isinstance(fields, str) else fields))
+    if workers is None:
+        table = _aggregate_chunk(rows, by, ops)
+    else:
+        table = {}
+        rows = iter(rows)
+        pending = deque()
+        with ProcessPoolExecutor(workers) as pool:
+            # pool.map() 会一次把所有的块都提交上去，这里限制同时在处理的块数，
+            # 避免把整个输入都读进内存
+            for chunk in iter(lambda: list(islice(rows, chunksize)), []):
+                pending.append(pool.submit(_aggregate_chunk, chunk, by, ops))
+                if len(pending) >= 2 * workers:
+                    _merge_tables(table, pending.popleft().result(), ops)
+            while pending:
+                _merge_tables(table, pending.popleft().result(), ops)
+
+    result = {}
+    for group, acc in table.items():
+        values = {'count': acc[0]} if count else {}
+        for (op, field), value in zip(ops, acc[1:]):
+            values['{}_{}'.format(op, field)] = value / acc[0] if op == 'mean' else value
+        result[group] = values
+    return result
+
+def _aggregate_chunk(rows, by, ops):
+    # 每一组的累加值是一个列表：[行数, 每个 (op, field) 一个值]，平均值先保存总和
+    key = itemgetter(*by) if isinstance(by, tuple) else itemgetter(by)
+    getters = [(op, itemgetter(field)) for op, field in ops]
+    table = {}
+    for row in rows:
+        group = key(row)
+        acc = table.get(group)
+        if acc is None:
+            table[group] = [1] + [get(row) for _, get in getters]
+            continue
+        acc[0] += 1
+        for i, (op, get) in enumerate(getters, 1):
+            value = get(row)
+            if op == 'sum' or op == 'mean':
+                acc[i] += value
+            elif op == 'min':
+                if value < acc[i]:
+                    acc[i] = value
+            elif value > acc[i]:
+                acc[i] = value
+    return table
+
+def _merge_tables(table, partial, ops):
+    for group, other in partial.items():
+        acc = table.get(group)
+        if acc is None:
+            table[group] = other
+            continue
+        acc[0] += other[0]
+        for i, (op, _) in enumerate(ops, 1):
+            if op == 'sum' or op == 'mean':
+                acc[i] += other[i]
+            elif op == 'min':
+                if other[i] < acc[i]:
+                    acc[i] = other[i]
+            elif other[i] > acc[i]:
+                acc[i] = other[i]
+
+trades = [
+    {'date': '07/01/2012', 'name': 'ACME', 'shares': 100, 'price': 32.2},
+    {'date': '07/01/2012', 'name': 'IBM', 'shares': 50, 'price': 91.1},
+    {'date': '07/02/2012', 'name': 'ACME', 'shares': 75, 'price': 33.5},
+    {'date': '07/02/2012', 'name': 'HPQ', 'shares': 200, 'price': 31.75},
+    {'date': '07/02/2012', 'name': 'IBM', 'shares': 30, 'price': 92.0},
+]
+aggregate(trades, by='date', count=True, sum='shares', max='price')
+# {'07/01/2012': {'count': 2, 'sum_shares': 150, 'max_price': 91.1},
+#  '07/02/2012': {'count': 3, 'sum_shares': 305, 'max_price': 92.0}}
+aggregate(trades, by='name', mean=('shares', 'price'))
+# {'ACME': {'mean_shares': 87.5, 'mean_price': 32.85},
+#  'IBM': {'mean_shares': 40.0, 'mean_price': 91.55},
+#  'HPQ': {'mean_shares': 200.0, 'mean_price': 31.75}}
@@ -60,3 +60,163 @@ values
 # 使用update()可以将两个字典合并，但这会创建一个完全不同的字典对象，或者破坏现有的字典结构。
 # 或者原字典做了更新，这种改变不会反应到新的合并字典中去。
 # ChainMap使用原来的字典，它自己不创建字典。所以它并不会产生上面的结果。
+
+# ChainMap 的每次查找都要从第一个映射开始逐个检查，作用域嵌套很深（比如模板引擎里 30 层）
+# 并且要查找几百万次的时候，O(层数) 的查找就成了瓶颈；len() 和 keys() 每次也要重新合并所有的键。
+# 下面的 FastChainMap 把每一层做成一个节点，通过 _parent 链接到上一层，
+# new_child() 和 parents 都只是创建或者返回一个节点，是 O(1) 的。
+# 每个节点缓存自己查找过的键（找不到的键也缓存），第二次查找同一个键就是一次字典查找。
+# 缓存什么时候失效？同一个 new_child() 家族共享一个写入计数 _epoch 和一个列表 _stamps，
+# _stamps[d] 记录深度小于 d 的层最后一次被写入时的计数。
+# 深度为 d 的节点只要发现 _stamps[d] 比自己缓存的计数新，就说明上面某一层被改过，清空缓存即可。
+# 写入深度为 d 的层时要更新 _stamps[d+1:]，通常写的都是最内层，所以很便宜。
+# 注意：修改必须通过 FastChainMap 进行，直接修改底层的字典不会让缓存失效。
+from collections.abc import MutableMapping
+
+_UNKNOWN = object()
+_MISSING = object()
+
+class _Family:
+    def __init__(self):
+        self.epoch = 0
+        self.stamps = [0]
+
+class FastChainMap(MutableMapping):
+    def __init__(self, *maps):
+        maps = list(maps) or [{}]
+        parent = None
+        for m in reversed(maps[1:]):
+            parent = self._link(m, parent)
+        self._init(maps[0], parent, parent._family if parent is not None else _Family())
+
+    @classmethod
+    def _link(cls, m, parent):
+        node = cls.__new__(cls)
+        node._init(m, parent, parent._family if parent is not None else _Family())
+        return node
+
+    def _init(self, m, parent, family):
+        self.map = m
+        self._parent = parent
+        self._family = family
+        self._depth = parent._depth + 1 if parent is not None else 0
+        stamps = family.stamps
+        if len(stamps) <= self._depth:
+            # 新的深度：保守地认为上面的层刚刚被写过
+            stamps.append(family.epoch)
+        self._stamps = stamps
+        self._epoch = family.epoch
+        self._cache = {}
+        self._flat = None
+
+    def _check(self):
+        if self._epoch < self._stamps[self._depth]:
+            self._cache.clear()
+            self._flat = None
+            self._epoch = self._family.epoch
+
+    def _touch(self):
+        family = self._family
+        family.epoch += 1
+        stamps = family.stamps
+        for d in range(self._depth + 1, len(stamps)):
+            stamps[d] = family.epoch
+        self._flat = None
+
+    def _lookup(self, key):
+        self._check()
+        value = self._cache.get(key, _UNKNOWN)
+        if value is _UNKNOWN:
+            node = self
+            while node is not None:
+                if node is not self:
+                    node._check()
+                    value = node._cache.get(key, _UNKNOWN)
+                    if value is not _UNKNOWN:
+                        break
+                if key in node.map:
+                    value = node.map[key]
+                    break
+                node = node._parent
+            else:
+                value = _MISSING
+            self._cache[key] = value
+        return value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not _MISSING
+
+    def __setitem__(self, key, value):
+        self.map[key] = value
+        self._check()
+        self._cache[key] = value
+        self._touch()
+
+    def __delitem__(self, key):
+        try:
+            del self.map[key]
+        except KeyError:
+            raise KeyError('Key not found in the first mapping: {!r}'.format(key))
+        self._cache.pop(key, None)
+        self._touch()
+
+    def clear(self):
+        self.map.clear()
+        self._cache.clear()
+        self._touch()
+
+    def _flatten(self):
+        # 把所有层合并成一个字典并缓存起来，len()/keys()/遍历都用它
+        self._check()
+        if self._flat is None:
+            flat = dict(self._parent._flatten()) if self._parent is not None else {}
+            flat.update(self.map)
+            self._flat = flat
+        return self._flat
+
+    def __iter__(self):
+        return iter(self._flatten())
+
+    def __len__(self):
+        return len(self._flatten())
+
+    def new_child(self, m=None):
+        return self._link({} if m is None else m, self)
+
+    @property
+    def parents(self):
+        return self._parent if self._parent is not None else type(self)()
+
+    @property
+    def maps(self):
+        result = []
+        node = self
+        while node is not None:
+            result.append(node.map)
+            node = node._parent
+        return result
+
+    def __repr__(self):
+        return 'FastChainMap({})'.format(', '.join(map(repr, self.maps)))
+
+# 用法和 ChainMap 完全一样：
+values = FastChainMap()
+values['x'] = 1
+values = values.new_child()
+values['x'] = 2
+values = values.new_child()
+values
+# FastChainMap({}, {'x': 2}, {'x': 1})
+values['x']
+# 2
+values.parents['x'] = 20
+values['x']
+# 20
+len(values)
+# 1
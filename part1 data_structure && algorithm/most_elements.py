@@ -48,3 +48,294 @@ print(d)
 # d
 # Counter({'eyes': 7, 'the': 5, 'look': 4, 'into': 3, 'my': 2, 'around': 2,
 # "you're": 1, "don't": 1, 'under': 1})
+
+# Counter 要为每一个不同的元素保存一个字典条目。
+# 如果是点击流这种不同元素非常多的数据，内存会一直涨下去。
+# 如果只关心出现次数最多的那些元素（heavy hitters），可以用固定大小的"概要"（sketch）代替。
+
+# Space-Saving 算法最多只保存 capacity 个计数器。
+# 来了一个新元素而计数器已经用完时，就把当前计数最小的那个元素替换掉，
+# 新元素接手它的计数（再加上自己的次数），被接手的那部分就是这个元素可能的高估误差。
+# 可以证明每个计数的误差不会超过 total / capacity，
+# 所以出现次数超过 total / capacity 的元素一定不会被漏掉。
+import heapq
+import math
+from array import array
+from hashlib import blake2b
+from itertools import islice
+from operator import itemgetter
+
+class SpaceSaving:
+    def __init__(self, capacity=1000, iterable=None):
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        # (count, 序号, item) 的最小堆，计数增加时不更新堆，淘汰的时候再修正。
+        self._heap = []
+        self._seq = 0
+        if iterable is not None:
+            self.update(iterable)
+
+    def update(self, iterable):
+        # 和 Counter.update() 一样，可以传入一个序列或者 元素->次数 的映射。
+        # 序列按块先用 Counter 汇总，这样重复的元素在一块里只需要处理一次。
+        if hasattr(iterable, 'items'):
+            for item, count in iterable.items():
+                self._add(item, count)
+            return
+        iterable = iter(iterable)
+        while True:
+            chunk = Counter(islice(iterable, 10000))
+            if not chunk:
+                break
+            for item, count in chunk.items():
+                self._add(item, count)
+
+    def _add(self, item, count):
+        counts = self._counts
+        self.total += count
+        if item in counts:
+            counts[item] += count
+            return
+        heap = self._heap
+        # 每个进堆的条目都要用新的序号：(count, seq) 相同时 heapq 会接着比较 item，
+        # 而不同类型的元素（比如 1 和 'a'）是不能比较的
+        self._seq += 1
+        if len(counts) < self.capacity:
+            counts[item] = count
+            self._errors[item] = 0
+            heapq.heappush(heap, (count, self._seq, item))
+            return
+        # 找到真正计数最小的元素：堆顶的计数可能已经过时，修正后再看
+        while True:
+            minimum, _, victim = heap[0]
+            if counts[victim] == minimum:
+                break
+            heapq.heapreplace(heap, (counts[victim], self._seq, victim))
+            self._seq += 1
+        del counts[victim]
+        del self._errors[victim]
+        counts[item] = minimum + count
+        self._errors[item] = minimum
+        heapq.heapreplace(heap, (minimum + count, self._seq, item))
+
+    def __getitem__(self, item):
+        return self._counts.get(item, 0)
+
+    def __contains__(self, item):
+        return item in self._counts
+
+    def __len__(self):
+        return len(self._counts)
+
+    def bounds(self, item):
+        """
+        返回 (lower, upper)：元素真实出现次数一定在这个范围内
+        """
+        if item in self._counts:
+            count = self._counts[item]
+            return count - self._errors[item], count
+        return 0, self._minimum()
+
+    def most_common(self, n=None):
+        if n is None:
+            return sorted(self._counts.items(), key=itemgetter(1), reverse=True)
+        return heapq.nlargest(n, self._counts.items(), key=itemgetter(1))
+
+    def _minimum(self):
+        # 计数器没用完之前，没被记录的元素一定一次都没出现过
+        if len(self._counts) < self.capacity:
+            return 0
+        return min(self._counts.values())
+
+    def merge(self, other):
+        """
+        合并另一个 SpaceSaving（原地修改）。某一边没有记录的元素，
+        按那一边的最小计数估算，然后只保留计数最大的 capacity 个。
+        """
+        min1, min2 = self._minimum(), other._minimum()
+        counts, errors = {}, {}
+        for item in self._counts.keys() | other._counts.keys():
+            counts[item] = self._counts.get(item, min1) + other._counts.get(item, min2)
+            errors[item] = self._errors.get(item, min1) + other._errors.get(item, min2)
+        keep = heapq.nlargest(self.capacity, counts.items(), key=itemgetter(1))
+        self._counts = dict(keep)
+        self._errors = {item: errors[item] for item, _ in keep}
+        self._heap = [(count, seq, item) for seq, (item, count) in enumerate(keep)]
+        heapq.heapify(self._heap)
+        self._seq = len(keep)
+        self.total += other.total
+        return self
+
+    def __add__(self, other):
+        result = SpaceSaving(self.capacity)
+        return result.merge(self).merge(other)
+
+top = SpaceSaving(capacity=7)
+top.update(words)
+top.most_common(3)
+# [('eyes', 8), ('the', 5), ('look', 4)]
+top.bounds('eyes')
+# (8, 8)
+(top + SpaceSaving(7, morewords)).most_common(3)
+# [('eyes', 8), ('the', 5), ('look', 5)]
+
+# 如果还需要查询任意元素的次数，可以用 Count-Min Sketch：
+# 一个 depth x width 的计数表，每个元素在每一行用不同的哈希选一个格子加一，
+# 查询时取各行的最小值。结果只会高估，并且以 1 - delta 的概率误差不超过 epsilon * total。
+# 表的大小是固定的，两个形状相同的表直接按格子相加或相减就可以合并。
+def _encode(item):
+    # 只支持 str、bytes、数字（int、bool、float）、None 以及由它们组成的元组，
+    # 其它类型没有跨进程稳定的编码方式，直接报错。
+    # 每种类型都加上不同的前缀，否则字符串 'i5' 和整数 5 的编码会完全一样，每一行都撞在同一个格子里
+    if isinstance(item, str):
+        return b's' + item.encode('utf-8', 'surrogatepass')
+    if isinstance(item, bytes):
+        return b'b' + item
+    if isinstance(item, float):
+        if not item.is_integer():
+            return b'f' + item.hex().encode('ascii')
+        # 和 Counter 一样，1.0 和 1 是同一个元素
+        item = int(item)
+    if isinstance(item, int):
+        # True == 1，两者要落在同一个格子里
+        return b'i' + str(int(item)).encode('ascii')
+    if item is None:
+        return b'n'
+    if isinstance(item, tuple):
+        parts = [_encode(x) for x in item]
+        return b't' + b''.join(len(p).to_bytes(4, 'little') + p for p in parts)
+    raise TypeError('unsupported key type: {}'.format(type(item).__name__))
+
+class CountMinSketch:
+    def __init__(self, epsilon=0.001, delta=0.01, iterable=None):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.total = 0
+        self._tables = [array('q', bytes(8 * self.width)) for _ in range(self.depth)]
+        if iterable is not None:
+            self.update(iterable)
+
+    def _columns(self, item):
+        # 字符串（以及包含字符串的元组）的 hash() 每个进程不一样，
+        # 为了能合并其他进程的结果，先编码成固定的字节串再用 blake2b 计算
+        h = int.from_bytes(blake2b(_encode(item), digest_size=8).digest(), 'little')
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def update(self, iterable):
+        if not hasattr(iterable, 'items'):
+            iterable = iter(iterable)
+            while True:
+                chunk = Counter(islice(iterable, 10000))
+                if not chunk:
+                    break
+                self.update(chunk)
+            return
+        tables = self._tables
+        for item, count in iterable.items():
+            self.total += count
+            for table, column in zip(tables, self._columns(item)):
+                table[column] += count
+
+    def __getitem__(self, item):
+        return min(table[column] for table, column in zip(self._tables, self._columns(item)))
+
+    def _combine(self, other, sign):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError('sketches must have the same width and depth')
+        result = CountMinSketch.__new__(CountMinSketch)
+        result.width, result.depth = self.width, self.depth
+        result.total = self.total + sign * other.total
+        result._tables = [array('q', (a + sign * b for a, b in zip(t1, t2)))
+                          for t1, t2 in zip(self._tables, other._tables)]
+        return result
+
+    def __add__(self, other):
+        return self._combine(other, 1)
+
+    def __sub__(self, other):
+        # 相减以后结果就不再保证只高估了，和 Counter 的减法一样只在语义上说得通的时候用
+        return self._combine(other, -1)
+
+    def merge(self, other):
+        merged = self + other
+        self._tables, self.total = merged._tables, merged.total
+        return self
+
+sketch = CountMinSketch(iterable=words)
+sketch['eyes']
+# 8
+(sketch + CountMinSketch(iterable=morewords))['look']
+# 5
+(sketch - CountMinSketch(iterable=morewords))['look']
+# 3
+
+# 统计几十 GB 的日志时，单个进程的 Counter 会很慢。
+# 可以把每个文件按字节范围切成若干块（切分点对齐到行边界），交给 ProcessPoolExecutor 并行统计。
+# 块数可能有几百上千个，如果每块返回一个 Counter，父进程里会同时攒下几百个 Counter，
+# 合并的时候还要把它们来回 pickle。所以每个进程只领一个任务：按顺序统计分给它的那些块，
+# 全部累加到同一个 Counter 里再返回；父进程哪个先完成就先合并哪个，
+# 任何时候最多只有 workers 个部分结果。
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
+
+def parallel_count(files_or_chunks, tokenizer=str.split, workers=None,
+                   chunksize=64 * 1024 * 1024, encoding='utf-8'):
+    """
+    files_or_chunks 可以是文件名，也可以是已经切好的 (文件名, 起始偏移, 结束偏移)。
+    tokenizer 把一行文本变成若干个要统计的元素，需要能被 pickle（不能是 lambda）。
+    """
+    chunks = []
+    for spec in files_or_chunks:
+        if isinstance(spec, tuple):
+            chunks.append(spec)
+        else:
+            size = os.path.getsize(spec)
+            chunks.extend((spec, start, min(start + chunksize, size))
+                          for start in range(0, size, chunksize))
+    if not chunks:
+        return Counter()
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    total = Counter()
+    with ProcessPoolExecutor(workers) as pool:
+        # 隔 workers 个取一块，每个进程分到的数据量差不多
+        futures = [pool.submit(_count_chunks, chunks[i::workers], tokenizer, encoding)
+                   for i in range(workers)]
+        for future in as_completed(futures):
+            # update() 是原地累加，比 total + counts 少创建一个新的 Counter
+            total.update(future.result())
+    return total
+
+def _count_chunks(chunks, tokenizer, encoding):
+    counts = Counter()
+    for chunk in chunks:
+        counts.update(chain.from_iterable(map(tokenizer, _read_lines(chunk, encoding))))
+    return counts
+
+def _read_lines(chunk, encoding):
+    # 起点落在 [start, end) 里的行属于这一块
+    path, start, end = chunk
+    with open(path, 'rb') as f:
+        if start > 0:
+            # 跳过上一块最后那一行剩下的部分
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        if pos >= end:
+            return []
+        data = f.read(end - pos)
+        if not data.endswith(b'\n'):
+            data += f.readline()
+    return data.decode(encoding).splitlines()
+
+if __name__ == '__main__':
+    import tempfile
+    with tempfile.NamedTemporaryFile('w', suffix='.log', delete=False) as f:
+        for _ in range(1000):
+            f.write(' '.join(words) + '\n')
+    print(parallel_count([f.name], chunksize=4096).most_common(3))
+    # [('eyes', 8000), ('the', 5000), ('look', 4000)]
+    os.remove(f.name)
@@ -43,4 +43,184 @@ a.indices(len(s))
 # (5, 10, 2)
 
 for i in range(*a.indices(len(s))):
-    print(s[i])
\ No newline at end of file
+    print(s[i])
+# 如果要处理的是几亿条定长记录，每条记录逐个字段切片、再 int()/float()，
+# 会为每个字段创建一个临时的字符串。下面的 FixedWidthLayout 用命名切片描述记录的布局，
+# 然后把它编译成一个 struct 格式（字段之间的空隙用 'x' 跳过），
+# 用 iter_unpack() 直接在 bytes/memoryview/mmap 上批量解码，
+# 类型转换也编译成一个生成的函数，每条记录只调用一次。
+import mmap
+import struct
+from array import array
+from itertools import islice
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class FixedWidthLayout:
+    """
+    FixedWidthLayout(SHARES=slice(20, 23), PRICE=slice(31, 37), types={'SHARES': int, 'PRICE': float})
+    record_size 是每条记录占的字节数（包括换行符），默认等于最后一个字段的结束位置。
+    没有给出类型的字段保留为 bytes。
+    """
+    def __init__(self, record_size=None, types=None, **fields):
+        types = types or {}
+        self.names = tuple(fields)
+        self.types = {name: types.get(name) for name in self.names}
+        fmt = []
+        order = []
+        pos = 0
+        for name, field in sorted(fields.items(), key=lambda kv: kv[1].start or 0):
+            start = field.start or 0
+            if field.stop is None or field.step not in (None, 1) or start < pos:
+                raise ValueError('fields must be non-overlapping slices with an explicit stop')
+            if start > pos:
+                fmt.append('{}x'.format(start - pos))
+            fmt.append('{}s'.format(field.stop - start))
+            order.append(name)
+            pos = field.stop
+        self.record_size = pos if record_size is None else record_size
+        if self.record_size < pos:
+            raise ValueError('record_size is smaller than the last field')
+        self._offsets = [fields[name].start or 0 for name in order]
+        self._widths = [fields[name].stop - (fields[name].start or 0) for name in order]
+        self._order = order
+        # _fields 只覆盖到最后一个字段，用来解码单条记录或者末尾缺少换行符的最后一条记录
+        self._fields = struct.Struct(''.join(fmt))
+        padding = '{}x'.format(self.record_size - pos) if self.record_size > pos else ''
+        self._record = struct.Struct(''.join(fmt) + padding)
+        self._convert, self._convert_all = self._compile()
+
+    def _compile(self):
+        # 生成类似 def convert(_0, _1): return (_t1(_1), _t0(_0)) 的函数，
+        # 把按偏移量排列的字段重新排成构造时给出的顺序，同时完成类型转换。
+        # convert_all() 是同样的逻辑写成列表推导式，一次转换一批记录，省掉每条记录一次函数调用
+        namespace = {}
+        args = ', '.join('_{}'.format(i) for i in range(len(self._order)))
+        exprs = []
+        for name in self.names:
+            i = self._order.index(name)
+            if self.types[name] is None:
+                exprs.append('_{}'.format(i))
+            else:
+                namespace['_t{}'.format(i)] = self.types[name]
+                exprs.append('_t{0}(_{0})'.format(i))
+        exprs = ', '.join(exprs)
+        source = ('def convert({0}):\n'
+                  '    return ({1},)\n'
+                  'def convert_all(rows):\n'
+                  '    return [({1},) for {0}, in rows]\n').format(args, exprs)
+        exec(source, namespace)
+        return namespace['convert'], namespace['convert_all']
+
+    def unpack(self, record):
+        # 解码单条记录
+        if isinstance(record, str):
+            record = record.encode('latin-1')
+        return self._convert(*self._fields.unpack_from(record))
+
+    def _split(self, buffer):
+        view = memoryview(buffer)
+        full = len(view) // self.record_size * self.record_size
+        tail = view[full:] if len(view) - full >= self._fields.size else None
+        return view[:full], tail
+
+    def records(self, buffer):
+        """
+        把整个缓冲区解码成一条条记录（元组）
+        """
+        body, tail = self._split(buffer)
+        rows = self._record.iter_unpack(body)
+        while True:
+            batch = self._convert_all(islice(rows, 65536))
+            if not batch:
+                break
+            yield from batch
+        if tail is not None:
+            yield self.unpack(tail)
+
+    def columns(self, buffer):
+        """
+        把整个缓冲区解码成按列存放的字典：int 列是 array('q')，float 列是 array('d')，
+        其余的列是列表。装了 NumPy 的话返回的是 NumPy 数组。
+        """
+        body, tail = self._split(buffer)
+        if np is not None:
+            return self._numpy_columns(body, tail)
+        raw = list(self._record.iter_unpack(body))
+        if tail is not None:
+            raw.append(self._fields.unpack_from(tail))
+        result = {}
+        for name in self.names:
+            column = map(itemgetter(self._order.index(name)), raw)
+            kind = self.types[name]
+            # 先转换成列表再构造 array，比直接从迭代器构造快
+            if kind is int:
+                result[name] = array('q', list(map(int, column)))
+            elif kind is float:
+                result[name] = array('d', list(map(float, column)))
+            elif kind is None:
+                result[name] = list(column)
+            else:
+                result[name] = list(map(kind, column))
+        return result
+
+    def _numpy_columns(self, body, tail):
+        dtype = np.dtype({'names': self._order,
+                          'formats': ['S{}'.format(width) for width in self._widths],
+                          'offsets': self._offsets,
+                          'itemsize': self.record_size})
+        table = np.frombuffer(body, dtype=dtype)
+        if tail is not None:
+            last = np.zeros(1, dtype=dtype)
+            last[0] = self._fields.unpack_from(tail)
+            table = np.concatenate([table, last])
+        result = {}
+        for name in self.names:
+            kind = self.types[name]
+            if kind is int:
+                result[name] = table[name].astype(np.int64)
+            elif kind is float:
+                result[name] = table[name].astype(np.float64)
+            elif kind is None:
+                # 复制一份，不再引用原来的缓冲区（比如马上要关闭的 mmap）
+                result[name] = table[name].copy()
+            else:
+                result[name] = np.array([kind(value) for value in table[name]])
+        return result
+
+    def iter_batches(self, path, batch_size=65536, columns=True):
+        """
+        用 mmap 打开文件，每次解码 batch_size 条记录，
+        返回每一批的列字典（columns=True）或者记录元组的列表。
+        """
+        with open(path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件不能 mmap
+                return
+            with mm:
+                step = batch_size * self.record_size
+                for start in range(0, len(mm), step):
+                    with memoryview(mm)[start:start + step] as chunk:
+                        if columns:
+                            yield self.columns(chunk)
+                        else:
+                            yield list(self.records(chunk))
+
+layout = FixedWidthLayout(SHARES=SHARES, PRICE=PRICE, types={'SHARES': int, 'PRICE': float})
+shares, price = layout.unpack(record)
+shares * price
+# 51325.0
+data = (record + '\n').encode() * 3
+layout = FixedWidthLayout(record_size=len(record) + 1, SHARES=SHARES, PRICE=PRICE,
+                          types={'SHARES': int, 'PRICE': float})
+list(layout.records(data))
+# [(100, 513.25), (100, 513.25), (100, 513.25)]
+columns = layout.columns(data)
+sum(s * p for s, p in zip(columns['SHARES'], columns['PRICE']))
+# 153975.0
@@ -1,5 +1,69 @@
 from collections import deque
 
+class AhoCorasick:
+    """
+    多模式匹配自动机：一次扫描就能找出一行里出现了哪些模式，
+    扫描速度只和文本长度有关，和模式的个数无关（5000 个模式也只扫一遍）。
+    先把所有模式建成一棵字典树，再用广度优先给每个节点算出失配指针，
+    扫描时遇到没有的转移就沿着失配指针回退；回退的结果会缓存在节点里，
+    所以同一个 (状态, 字符) 只会回退一次，之后就是一次字典查找。
+    """
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [{}]
+        # 每个节点结束的模式下标（包括沿失配指针能到达的那些）
+        out = [()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] += (index,)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if state else 0
+                out[nxt] += out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def _step(self, state, ch):
+        goto, fail = self._goto, self._fail
+        f = state
+        while ch not in goto[f] and f:
+            f = fail[f]
+        nxt = goto[f].get(ch, 0)
+        goto[state][ch] = nxt
+        return nxt
+
+    def findall(self, text):
+        """
+        返回 text 中出现过的模式（按构造时给出的顺序，不重复）
+        """
+        goto, out = self._goto, self._out
+        state = 0
+        found = set()
+        for ch in text:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = self._step(state, ch)
+            state = nxt
+            if out[state]:
+                found.update(out[state])
+        return [self.patterns[index] for index in sorted(found)]
+
 def search(lines, pattern, history=5):
     """
     在写查询元素的代码时，通常会使用包含yield表达式的生成器函数，
@@ -9,6 +73,14 @@ def search(lines, pattern, history=5):
     在队列两端插入或删除元素的时间复杂度都是O(1),区别与列表的O(n)。
     """
     previous_lines = deque(maxlen=history)
+    if isinstance(pattern, AhoCorasick):
+        # 同时查找多个模式时，额外返回这一行匹配到了哪些模式
+        for line in lines:
+            matched = pattern.findall(line)
+            if matched:
+                yield line, previous_lines, matched
+            previous_lines.append(line)
+        return
     for line in lines:
         if pattern in line:
             yield line, previous_lines
@@ -24,3 +96,80 @@ with open(r'../../cookbook/somefile.txt') as f:
         print(line, end='')
         print('-' * 20)
 
+
+"""
+上面的 search() 要把每一行都解码成字符串、放进 deque，即使这一行根本不匹配。
+在几个 G 的日志里查找时，绝大部分时间都花在了这些不匹配的行上。
+下面的 context_search() 用 mmap 把整个文件映射进内存，直接在字节上用 find()（或者正则）查找，
+找到匹配之后再从匹配位置用 rfind()/find() 向前、向后找换行符，取出前 before 行和后 after 行。
+这样只有匹配的行和它们的上下文才会被切出来、解码，其余的行连一次 Python 循环都不用走。
+pattern 可以是 str、bytes，或者编译好的 bytes 正则（re.compile(rb'...')）。
+注意返回的行保留原始的换行符（比如 '\r\n'），不做文本模式下的换行转换。
+"""
+import mmap
+
+def context_search(path, pattern, before=5, after=0, encoding='utf-8'):
+    if isinstance(pattern, str):
+        pattern = pattern.encode(encoding)
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件不能 mmap
+            return
+        with mm:
+            size = len(mm)
+            pos = 0
+            while pos < size:
+                if isinstance(pattern, bytes):
+                    found = mm.find(pattern, pos)
+                else:
+                    match = pattern.search(mm, pos)
+                    found = match.start() if match else -1
+                if found < 0:
+                    return
+                start = mm.rfind(b'\n', 0, found) + 1
+                end = _line_end(mm, found)
+                yield (mm[start:end].decode(encoding),
+                       [line.decode(encoding) for line in _lines_before(mm, start, before)],
+                       [line.decode(encoding) for line in _lines_after(mm, end, after)])
+                # 同一行里的其它匹配不再重复输出
+                pos = end
+
+def _line_end(mm, pos):
+    end = mm.find(b'\n', pos)
+    return len(mm) if end < 0 else end + 1
+
+def _lines_before(mm, start, n):
+    lines = []
+    while len(lines) < n and start > 0:
+        prev = mm.rfind(b'\n', 0, start - 1) + 1
+        lines.append(mm[prev:start])
+        start = prev
+    lines.reverse()
+    return lines
+
+def _lines_after(mm, end, n):
+    lines = []
+    while len(lines) < n and end < len(mm):
+        nxt = _line_end(mm, end)
+        lines.append(mm[end:nxt])
+        end = nxt
+    return lines
+
+for line, prevlines, nextlines in context_search(r'../../cookbook/somefile.txt', 'python', 5, 1):
+    for pline in prevlines:
+        print(pline, end='')
+    print(line, end='')
+    for nline in nextlines:
+        print(nline, end='')
+    print('-' * 20)
+
+# 要同时查找很多个关键字时，先把它们编译成 AhoCorasick，再当作 pattern 传给 search()，
+# 每一行只扫描一遍，返回的第三个值是这一行匹配到的关键字：
+matcher = AhoCorasick(['python', 'java', 'rust'])
+matcher.findall('python is not java')
+# ['python', 'java']
+with open(r'../../cookbook/somefile.txt') as f:
+    for line, prevlines, matched in search(f, matcher, 5):
+        print(matched, line, end='')
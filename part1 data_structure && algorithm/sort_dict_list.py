@@ -51,4 +51,223 @@ rows_by_lfname = sorted(rows, key=lambda r: (r['lname'],r['fname']))
 这种方案也不错。但是，使用 itemgetter() 方式会运行的稍微快点。
 因此，如果你对性能要求比较高的话就使用 itemgetter() 方式。
 最后，不要忘了这节中展示的技术也同样适用于 min() 和 max() 等函数。比如
-"""
\ No newline at end of file
+"""
+"""
+不管是 itemgetter() 还是 lambda，排序的时候都要为每一行调用一次 key 函数，
+在字典里查找字段、再组装成一个元组。几千万行的时候，大部分时间都花在了这上面。
+如果经常要按不同的字段排序，可以把数据按列存放（struct of arrays）：
+每个字段一个数组（有 NumPy 的时候用 NumPy 数组），排序时用 np.lexsort() 直接在
+这些数组上计算出一个排列（下标数组），行本身不需要移动或复制。
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class RecordTable:
+    def __init__(self, columns):
+        # columns: 字段名 -> 列（NumPy 数组或者列表）
+        self.columns = columns
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    @classmethod
+    def from_rows(cls, rows, fields=None):
+        rows = rows if isinstance(rows, list) else list(rows)
+        if fields is None:
+            fields = list(rows[0]) if rows else []
+        columns = {}
+        for field in fields:
+            column = list(map(itemgetter(field), rows))
+            columns[field] = _to_array(column) if np is not None else column
+        return cls(columns)
+
+    def __len__(self):
+        return self._length
+
+    def sort_by(self, *fields, reverse=False):
+        """
+        返回按 fields 排序后的排列（下标数组），和 sorted() 一样是稳定的。
+        """
+        if np is None:
+            # 从最次要的字段开始依次做稳定排序，效果等同于按元组排序，但不用创建元组
+            perm = list(range(self._length))
+            for field in reversed(fields):
+                perm.sort(key=self.columns[field].__getitem__, reverse=reverse)
+            return perm
+        keys = [self.columns[field] for field in reversed(fields)]
+        if any(key.dtype == object for key in keys):
+            # lexsort() 不支持 object 数组（比如混有 None 的列），退回到逐列的稳定排序。
+            # 降序的稳定排序等于：反转、升序稳定排序、再反转（list.sort 也是这么做的）
+            perm = np.arange(self._length)
+            for key in keys:
+                if reverse:
+                    perm = perm[::-1]
+                perm = perm[np.argsort(key[perm], kind='stable')]
+                if reverse:
+                    perm = perm[::-1]
+            return perm
+        if reverse:
+            # 倒过来以后相同的键也要保持原来的先后顺序，所以把下标也作为最次要的键
+            return np.lexsort([-np.arange(self._length)] + keys)[::-1]
+        return np.lexsort(keys)
+
+    def sorted_view(self, *fields, reverse=False):
+        return TableView(self, self.sort_by(*fields, reverse=reverse))
+
+    def rows(self, perm=None):
+        # 按 perm 的顺序逐行生成字典，一次只转换一小块
+        perm = range(self._length) if perm is None else perm
+        names = list(self.columns)
+        for start in range(0, len(perm), 10000):
+            index = perm[start:start + 10000]
+            if np is not None:
+                columns = [self.columns[name][index].tolist() for name in names]
+            else:
+                columns = [[self.columns[name][i] for i in index] for name in names]
+            for values in zip(*columns):
+                yield dict(zip(names, values))
+
+def _to_array(column):
+    # 只有整列都是同一种 int/float/str 的时候才让 NumPy 推断类型。
+    # 混合类型的列（比如 [10, '9', 2] 或者 [1, 2.5]）如果交给 np.array()，
+    # 会被悄悄转成字符串或者浮点数，排序结果和 rows() 返回的值都会变，
+    # 所以用 object 数组原样保存，排序时退回到逐列的 argsort()（和 sorted() 一样比较原来的值）
+    types = set(map(type, column))
+    if len(types) == 1 and types <= {int, float, str}:
+        array = np.array(column)
+        if array.dtype != object:
+            return array
+    # np.array() 会把元组、列表之类的值展开成多维数组，fromiter() 不会
+    return np.fromiter(column, dtype=object, count=len(column))
+
+class TableView:
+    """
+    按某个排列查看 RecordTable 的视图，不复制任何行
+    """
+    def __init__(self, table, perm):
+        self.table = table
+        self.perm = perm
+
+    def __len__(self):
+        return len(self.perm)
+
+    def __iter__(self):
+        return self.table.rows(self.perm)
+
+    def __getitem__(self, i):
+        return next(self.table.rows([self.perm[i]]))
+
+    def column(self, name):
+        column = self.table.columns[name]
+        if np is not None:
+            return column[self.perm]
+        return [column[i] for i in self.perm]
+
+table = RecordTable.from_rows(rows)
+list(table.sort_by('lname', 'fname'))
+# [1, 2, 3, 0]
+view = table.sorted_view('lname', 'fname')
+view[0]
+# {'fname': 'David', 'lname': 'Beazley', 'uid': 1002}
+list(view.column('uid'))
+# [1002, 1001, 1004, 1003]
+mixed = [{'a': 10}, {'a': 2.5}, {'a': 2}]
+list(RecordTable.from_rows(mixed).rows()) == mixed
+# True
+list(RecordTable.from_rows(mixed).sort_by('a'))
+# [2, 1, 0]
+
+"""
+如果行数多到内存里根本放不下，就需要外部排序：
+每次读入 memory_limit 行排好序写进一个临时文件（顺串），
+最后用 heapq.merge() 把所有的顺串归并成一个有序的流（参考 part4 的 merge_iterator_by_order.py）。
+为了让临时文件紧凑一些，同一批里字段相同的字典只保存一次字段名，每一行只保存值的元组。
+顺串太多的时候，一次打开所有文件可能超过系统限制，
+所以每次最多归并 max_open_files 个，多出来的先分组归并成更长的顺串，直到剩下的不超过这个数。
+"""
+import heapq
+import os
+import pickle
+import tempfile
+from itertools import islice
+
+def external_sorted(rows, key=None, reverse=False, memory_limit=1000000,
+                    max_open_files=64, tmpdir=None):
+    if max_open_files < 2:
+        # 每组只归并一个顺串的话顺串数不会减少，下面的循环永远停不下来
+        raise ValueError('max_open_files must be at least 2')
+    rows = iter(rows)
+    runs = []
+    # 所有创建过的临时文件，最后统一删除
+    created = []
+    readers = []
+    try:
+        while True:
+            chunk = list(islice(rows, memory_limit))
+            if not chunk:
+                break
+            chunk.sort(key=key, reverse=reverse)
+            if not runs and len(chunk) < memory_limit:
+                # 放得下内存，直接输出
+                yield from chunk
+                return
+            runs.append(_write_run(chunk, tmpdir, created))
+            del chunk
+        # 顺串写完就关闭，只保存路径；归并的时候才打开这一组，
+        # 所以同时打开的文件最多是 max_open_files 个再加上一个输出文件
+        while len(runs) > max_open_files:
+            # 按顺序分组归并，保证相同的键仍然按原来的先后输出（稳定排序）
+            merged = []
+            for start in range(0, len(runs), max_open_files):
+                group = runs[start:start + max_open_files]
+                readers = [_read_run(path) for path in group]
+                merged.append(_write_run(heapq.merge(*readers, key=key, reverse=reverse),
+                                         tmpdir, created))
+                for path in group:
+                    os.remove(path)
+            runs = merged
+        readers = [_read_run(path) for path in runs]
+        yield from heapq.merge(*readers, key=key, reverse=reverse)
+    finally:
+        # 没有读完就停止迭代的时候，先关闭还打开着的文件再删除
+        for reader in readers:
+            reader.close()
+        for path in created:
+            if os.path.exists(path):
+                os.remove(path)
+
+def _write_run(rows, tmpdir, created):
+    fd, path = tempfile.mkstemp(dir=tmpdir)
+    created.append(path)
+    with os.fdopen(fd, 'wb') as f:
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, 1000))
+            if not batch:
+                break
+            fields = tuple(batch[0]) if type(batch[0]) is dict else None
+            if fields is not None and all(type(row) is dict and tuple(row) == fields for row in batch):
+                pickle.dump((fields, [tuple(row.values()) for row in batch]), f, pickle.HIGHEST_PROTOCOL)
+            else:
+                pickle.dump((None, batch), f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                fields, batch = pickle.load(f)
+            except EOFError:
+                return
+            if fields is None:
+                yield from batch
+            else:
+                for values in batch:
+                    yield dict(zip(fields, values))
+
+for row in external_sorted(rows, key=itemgetter('lname', 'fname'), memory_limit=2, max_open_files=2):
+    print(row)
+# {'fname': 'David', 'lname': 'Beazley', 'uid': 1002}
+# {'fname': 'John', 'lname': 'Cleese', 'uid': 1001}
+# {'fname': 'Big', 'lname': 'Jones', 'uid': 1004}
+# {'fname': 'Brian', 'lname': 'Jones', 'uid': 1003}